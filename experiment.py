@@ -9,6 +9,8 @@ from datetime import datetime
 
 from generate_letter_seq import generate_letter_seq
 from eye_tracking      import calibrate_eye_tracker, start_eye_recording, stop_eye_recording
+import telemetry
+import quality
 
 # ─────────────────────────────────────────────────────────────────────────────
 # CONFIG
@@ -16,6 +18,7 @@ from eye_tracking      import calibrate_eye_tracker, start_eye_recording, stop_e
 TRIALS          = 5
 NUM_TARGETS     = 10     # ← for testing, 10 sounds/block
 LETTER_DELAY_MS = 2500   # 1.5 s per tone
+MAX_ISSUE_LINES = 3      # quality issues shown on the rerun prompt
 
 LIGHT_DESC = {
     '1': "Complete Darkness (0–5 lux)",
@@ -95,20 +98,33 @@ def create_experiment_folder(pid):
     root = os.path.join(base, f"{pid}_{ts}")
     print(f"[DEBUG] Creating data folder: {root}")
     for t in range(1, TRIALS+1):
-        td = os.path.join(root, f"trial_{t}")
-        os.makedirs(td, exist_ok=True)
-        with open(os.path.join(td, "main.csv"), 'w', newline='', encoding='utf-8') as f:
-            f.write(
-                "Participant ID,Run ID,Timestamp,Stimulus,N-back Level,"
-                "Lighting Condition,N-back Sequence,Key Press,Response Time,Key Duration\n"
-            )
-        with open(os.path.join(td, "eye_data.csv"), 'w', newline='', encoding='utf-8') as f:
-            f.write(
-                "Participant ID,Run ID,Timestamp,Left Pupil Dilation,"
-                "Right Pupil Dilation,Blink\n"
-            )
+        init_trial_files(os.path.join(root, f"trial_{t}"))
     return root
 
+def init_trial_files(td):
+    os.makedirs(td, exist_ok=True)
+    with open(os.path.join(td, "main.csv"), 'w', newline='', encoding='utf-8') as f:
+        f.write(
+            "Participant ID,Run ID,Timestamp,Stimulus,N-back Level,"
+            "Lighting Condition,N-back Sequence,Key Press,Response Time,Key Duration\n"
+        )
+    with open(os.path.join(td, "eye_data.csv"), 'w', newline='', encoding='utf-8') as f:
+        f.write(
+            "Participant ID,Run ID,Timestamp,Left Pupil Dilation,"
+            "Right Pupil Dilation,Blink\n"
+        )
+
+def archive_trial_files(td, attempt):
+    # Keep a flagged attempt's data in trial_N/rerun_<attempt>/ and start clean.
+    dest = os.path.join(td, f"rerun_{attempt}")
+    os.makedirs(dest, exist_ok=True)
+    for name in ("main.csv", "eye_data.csv", "quality.csv"):
+        src = os.path.join(td, name)
+        if os.path.exists(src):
+            os.replace(src, os.path.join(dest, name))
+    init_trial_files(td)
+    print(f"[DEBUG] Archived flagged attempt → {dest}")
+
 # ─────────────────────────────────────────────────────────────────────────────
 # EXPERIMENT
 # ─────────────────────────────────────────────────────────────────────────────
@@ -125,21 +141,27 @@ class AuditoryNBack:
             raise RuntimeError("Invalid N‑back format.")
         # 2) Folder & eye calibration
         self.root_folder = create_experiment_folder(self.pid)
+        telemetry.start_telemetry(self.pid)
         calibrate_eye_tracker()
         # 3) Lighting order
         self.light_order = random.sample(['1','2','3','4'], 4) + ['5']
 
     def run(self):
         for trial in range(1, TRIALS+1):
-            self.run_trial(trial)
+            attempt = 1
+            while not self.run_trial(trial, attempt):
+                attempt += 1
         SCREEN.fill(BLACK)
         bye = FONT.render("Done – Thank You!", True, WHITE)
         SCREEN.blit(bye, bye.get_rect(center=(info.current_w//2, info.current_h//2)))
         pygame.display.flip()
         time.sleep(2)
+        telemetry.event("session_end")
+        telemetry.stop_telemetry()
         pygame.quit()
 
-    def run_trial(self, trial):
+    def run_trial(self, trial, attempt=1):
+        """Run one trial; returns False if the operator chose to rerun it."""
         # A) Lighting instruction
         Lkey = self.light_order[trial-1]
         desc = LIGHT_DESC[Lkey]
@@ -160,14 +182,19 @@ class AuditoryNBack:
         # C) Start eye tracking
         trial_folder = os.path.join(self.root_folder, f"trial_{trial}")
         start_eye_recording(self.pid, f"Run{trial}", trial_folder)
+        telemetry.set_context(trial=trial, block=None, n=None, letter=None)
+        telemetry.event("trial_start", trial=trial, lighting=desc)
 
         # D) Auditory blocks
         all_resps = []
         t0 = time.time()
 
         for blk_i, n in enumerate(self.n_seq):
-            seq, _ = generate_letter_seq(n, NUM_TARGETS)
-            for letter in seq:
+            seq, targets = generate_letter_seq(n, NUM_TARGETS)
+            targets = set(targets)
+            telemetry.set_context(block=blk_i+1, n=n)
+            for pos, letter in enumerate(seq):
+                telemetry.set_context(letter=letter)
                 # show cross + label
                 SCREEN.fill(BLACK); draw_cross()
                 lbl = FONT.render(f"{n}-back", True, WHITE)
@@ -201,6 +228,7 @@ class AuditoryNBack:
                             pressed = True
                             rt      = time.time() - onset
                             kd_ts   = time.time()
+                            telemetry.response(rt)
                         elif ev.type==pygame.KEYUP   and ev.key==pygame.K_SPACE and pressed and dur is None:
                             dur = time.time() - kd_ts
                         elif ev.type==pygame.QUIT:
@@ -223,6 +251,7 @@ class AuditoryNBack:
                     round(dur,4) if dur is not None else ""
                 ]
                 all_resps.append(resp)
+                quality.letter_result(blk_i+1, n, pos in targets, pressed)
 
             # inter‑block
             if blk_i < len(self.n_seq)-1:
@@ -234,30 +263,57 @@ class AuditoryNBack:
 
         # E) Stop eye tracking
         stop_eye_recording(self.pid, f"Run{trial}", trial_folder)
+        telemetry.set_context(letter=None)
+        telemetry.event("trial_end", trial=trial, responses=sum(1 for r in all_resps if r[7]))
 
-        # F) Write CSV + rating
+        # F) Write CSV
         csv_path = os.path.join(trial_folder, "main.csv")
         with open(csv_path, 'a', newline='', encoding='utf-8') as f:
-            w = csv.writer(f)
-            w.writerows(all_resps)
+            csv.writer(f).writerows(all_resps)
             print(f"[DEBUG] Wrote {len(all_resps)} rows → {csv_path}")
 
-            # difficulty rating
+        # G) Quality gate (before the rating, so a bad trial can be rerun)
+        summary = quality.summarize()
+        issues  = quality.check(summary)
+        qpath   = quality.write_summary(trial_folder, summary, issues)
+        print(f"[DEBUG] Quality {'FLAGGED' if issues else 'OK'} → {qpath}")
+        telemetry.event("quality", trial=trial, ok=not issues, issues=issues)
+        if issues:
+            # Drop late SPACE responses queued during the writes above so the
+            # operator actually sees the prompt; "keep" is RETURN, not SPACE.
+            pygame.event.clear()
+            SCREEN.fill(BLACK)
+            shown = issues[:MAX_ISSUE_LINES]
+            if len(issues) > len(shown):
+                shown.append(f"+{len(issues)-len(shown)} more – see quality.csv / viewer")
+            lines = [f"Trial {trial}: data quality check failed"] + shown + \
+                    ["", "R = rerun trial    ENTER = keep and continue"]
+            for i, line in enumerate(lines):
+                t = FONT.render(line, True, WHITE)
+                SCREEN.blit(t, t.get_rect(center=(info.current_w//2, info.current_h//4 + i*60)))
+            pygame.display.flip()
+            if wait_key([pygame.K_r, pygame.K_RETURN]) == pygame.K_r:
+                archive_trial_files(trial_folder, attempt)
+                return False
+
+        # H) Difficulty rating
+        with open(csv_path, 'a', newline='', encoding='utf-8') as f:
             SCREEN.fill(BLACK)
             rmsg = FONT.render("Rate difficulty 1–5", True, WHITE)
             SCREEN.blit(rmsg, rmsg.get_rect(center=(info.current_w//2, info.current_h//2)))
             pygame.display.flip()
             k = wait_key([pygame.K_1,pygame.K_2,pygame.K_3,pygame.K_4,pygame.K_5])
             rating = {pygame.K_1:1,pygame.K_2:2,pygame.K_3:3,pygame.K_4:4,pygame.K_5:5}[k]
-            w.writerow(["Difficulty Rating", rating])
+            csv.writer(f).writerow(["Difficulty Rating", rating])
             print(f"[DEBUG] Appended rating {rating}")
 
-        # G) Trial‑done flash
+        # I) Trial‑done flash
         SCREEN.fill(BLACK)
         dmsg = FONT.render(f"Trial {trial} complete!", True, WHITE)
         SCREEN.blit(dmsg, dmsg.get_rect(center=(info.current_w//2, info.current_h//2)))
         pygame.display.flip()
         pygame.time.wait(800)
+        return True
 
 if __name__ == "__main__":
     AuditoryNBack().run()
@@ -1,8 +1,11 @@
 import os
 import time
 import csv
+import math
 import threading
 import tobii_research as tr  # Ensure Tobii Pro SDK is installed and compatible
+import telemetry
+import quality
 
 # Global variables for the eye tracker and CSV writing.
 eye_tracker_available = False
@@ -56,6 +59,9 @@ def gaze_data_callback(gaze_data):
     right_valid = gaze_data.get('right_validity', gaze_data.get('right_pupil_validity', 0))
     blink_flag  = 1 if (left_valid != 0 or right_valid != 0) else 0
 
+    # Usable sample = at least one pupil diameter present (Tobii reports nan otherwise)
+    pupil_ok = not all(p is None or (isinstance(p, float) and math.isnan(p)) for p in (left_pupil, right_pupil))
+
     # Detect blink onset (0 -> 1 transition)
     if blink_flag and not prev_blink:
         blink_count += 1
@@ -63,6 +69,9 @@ def gaze_data_callback(gaze_data):
 
     with gaze_data_lock:
         gaze_data_buffer.append((ts, left_pupil, right_pupil, blink_flag))
+        buffer_fill = len(gaze_data_buffer)
+    telemetry.gaze_sample(pupil_ok, buffer_fill)
+    quality.gaze_sample(ts, pupil_ok)
 
 # Calibration function
 def calibrate_eye_tracker():
@@ -84,12 +93,14 @@ def start_eye_recording(participant_id, run_id, folder_path):
     prev_blink = 0
 
     if eye_tracker_available and eye_tracker is not None:
+        quality.start_trial(eye_tracker.get_gaze_output_frequency())
         eye_file_path = os.path.join(folder_path, "eye_data.csv")
         csv_file = open(eye_file_path, 'a', newline='', encoding='utf-8')
         csv_writer = csv.writer(csv_file)
         eye_tracker.subscribe_to(tr.EYETRACKER_GAZE_DATA, gaze_data_callback, as_dictionary=True)
         print("Started eye tracking (subscribed to gaze stream). Data will buffer until stop.")
     else:
+        quality.start_trial(None)
         print("Eye tracker not available; simulated data will be used if needed.")
 
 # Stop eye data collection and write to CSV
@@ -97,6 +108,7 @@ def stop_eye_recording(participant_id, run_id, folder_path):
     global csv_file, csv_writer, gaze_data_buffer, blink_count
     if eye_tracker_available and eye_tracker is not None:
         eye_tracker.unsubscribe_from(tr.EYETRACKER_GAZE_DATA, gaze_data_callback)
+        quality.stop_trial()
         print("Stopped eye tracking (unsubscribed). Writing data.")
 
     if csv_file:
@@ -0,0 +1,199 @@
+# quality.py
+#
+# Incremental data-quality monitor for one trial. The gaze callback and the
+# response loop feed it sample by sample; it only keeps running counters
+# (constant memory, no copy of the gaze buffer). At the end of the trial the
+# summary is written to quality.csv next to eye_data.csv and checked against
+# THRESHOLDS so the operator can rerun a bad trial straight away.
+
+import csv
+import os
+import threading
+import time
+
+# ─────────────────────────────────────────────────────────────────────────────
+# CONFIG (thresholds) — edit here; this is the only place they are read from
+# ─────────────────────────────────────────────────────────────────────────────
+THRESHOLDS = {
+    "min_valid_ratio":   0.80,   # share of samples with at least one valid pupil
+    "min_rate_ratio":    0.90,   # effective / configured gaze frequency
+    "max_gap_ms":        100.0,  # a pause longer than this counts as a gap
+    "max_gaps":          5,      # gaps allowed per trial
+    "max_leading_nan_s": 2.0,    # no data / invalid run at the start of the recording
+    "flag_no_response":  True,   # block with no key press / every target missed
+}
+
+# ─────────────────────────────────────────────────────────────────────────────
+# STATE
+# ─────────────────────────────────────────────────────────────────────────────
+_lock = threading.Lock()
+_expected_hz = None
+
+# Recording window (wall clock), so a stream that starts late or dies early
+# still counts against the rate and the leading/trailing gaps.
+_start_wall    = None
+_stop_wall     = None
+_first_wall    = None
+_last_wall     = None
+
+# Gaze counters. Timestamps are Tobii system time stamps (microseconds).
+_samples       = 0
+_valid         = 0
+_first_ts      = None
+_last_ts       = None
+_gaps          = 0
+_max_gap_us    = 0
+_leading_nan   = True    # still inside the initial invalid run?
+_leading_nan_n = 0
+
+# Responses: block index -> [n_level, targets, hits, misses, false_alarms]
+_blocks = {}
+
+def start_trial(expected_hz=None):
+    """Reset all counters. expected_hz=None skips the gaze checks (no tracker)."""
+    global _expected_hz, _samples, _valid, _first_ts, _last_ts
+    global _gaps, _max_gap_us, _leading_nan, _leading_nan_n
+    global _start_wall, _stop_wall, _first_wall, _last_wall
+    with _lock:
+        _expected_hz   = expected_hz
+        _start_wall    = time.time()
+        _stop_wall     = None
+        _first_wall    = None
+        _last_wall     = None
+        _samples       = 0
+        _valid         = 0
+        _first_ts      = None
+        _last_ts       = None
+        _gaps          = 0
+        _max_gap_us    = 0
+        _leading_nan   = True
+        _leading_nan_n = 0
+        _blocks.clear()
+
+def stop_trial():
+    """Mark the end of the recording window (call when unsubscribing)."""
+    global _stop_wall
+    with _lock:
+        _stop_wall = time.time()
+
+# ─────────────────────────────────────────────────────────────────────────────
+# FEEDERS
+# ─────────────────────────────────────────────────────────────────────────────
+def gaze_sample(ts, valid):
+    """Fold one gaze sample into the counters. Called from the Tobii callback thread."""
+    global _samples, _valid, _first_ts, _last_ts, _gaps, _max_gap_us
+    global _leading_nan, _leading_nan_n, _first_wall, _last_wall
+    now = time.time()
+    with _lock:
+        _samples += 1
+        _last_wall = now
+        if valid:
+            _valid += 1
+            _leading_nan = False
+        elif _leading_nan:
+            _leading_nan_n += 1
+        if _last_ts is not None:
+            gap = ts - _last_ts
+            if gap > THRESHOLDS["max_gap_ms"] * 1000:
+                _gaps += 1
+            if gap > _max_gap_us:
+                _max_gap_us = gap
+        else:
+            _first_ts   = ts
+            _first_wall = now
+        _last_ts = ts
+
+def letter_result(block, n, is_target, pressed):
+    """Record the outcome of one stimulus in the given block."""
+    with _lock:
+        stats = _blocks.setdefault(block, [n, 0, 0, 0, 0])
+        if is_target:
+            stats[1] += 1
+            if pressed:
+                stats[2] += 1
+            else:
+                stats[3] += 1
+        elif pressed:
+            stats[4] += 1
+
+# ─────────────────────────────────────────────────────────────────────────────
+# SUMMARY
+# ─────────────────────────────────────────────────────────────────────────────
+def summarize():
+    """Return the current trial's quality figures as a dict."""
+    with _lock:
+        # Rate over the whole recording window, not just first..last sample.
+        stop   = _stop_wall if _stop_wall is not None else time.time()
+        span_s = stop - _start_wall if _start_wall is not None else 0.0
+        rate   = _samples / span_s if span_s > 0 else 0.0
+        # Silence before the first / after the last sample counts as a gap too.
+        start_delay = (_first_wall if _first_wall is not None else stop) - (_start_wall or stop)
+        tail_gap    = stop - _last_wall if _last_wall is not None else 0.0
+        gaps, max_gap_s = _gaps, _max_gap_us / 1e6
+        for edge in (start_delay, tail_gap):
+            if edge * 1000 > THRESHOLDS["max_gap_ms"]:
+                gaps += 1
+            max_gap_s = max(max_gap_s, edge)
+        leading = start_delay + (_leading_nan_n / _expected_hz if _expected_hz else 0.0)
+        return {
+            "expected_hz":   _expected_hz,
+            "samples":       _samples,
+            "duration_s":    round(span_s, 3),
+            "valid_ratio":   round(_valid / _samples, 4) if _samples else 0.0,
+            "effective_hz":  round(rate, 2),
+            "rate_ratio":    round(rate / _expected_hz, 4) if _expected_hz else None,
+            "start_delay_s": round(start_delay, 3),
+            "gaps":          gaps,
+            "max_gap_ms":    round(max_gap_s * 1000, 2),
+            "leading_nan_s": round(leading, 3) if _expected_hz else None,
+            "blocks": [
+                {"block": b, "n": s[0], "targets": s[1], "hits": s[2],
+                 "missed": s[3], "false_alarms": s[4]}
+                for b, s in sorted(_blocks.items())
+            ],
+        }
+
+def check(summary):
+    """Return a list of human-readable problems; empty means the trial looks fine."""
+    th = THRESHOLDS
+    issues = []
+    if summary["expected_hz"]:
+        if summary["samples"] == 0:
+            issues.append("No gaze samples recorded")
+        else:
+            if summary["valid_ratio"] < th["min_valid_ratio"]:
+                issues.append(f"Valid samples {summary['valid_ratio']:.0%} < {th['min_valid_ratio']:.0%}")
+            if summary["rate_ratio"] < th["min_rate_ratio"]:
+                issues.append(f"Gaze rate {summary['effective_hz']:.0f} Hz of {summary['expected_hz']:.0f} Hz")
+            if summary["gaps"] > th["max_gaps"]:
+                issues.append(f"{summary['gaps']} gaps > {th['max_gap_ms']:.0f} ms (max {summary['max_gap_ms']:.0f} ms)")
+            if summary["leading_nan_s"] > th["max_leading_nan_s"]:
+                issues.append(f"Starts with {summary['leading_nan_s']:.1f} s of missing/invalid samples")
+    # Only gate on a participant who stopped responding; ordinary miss rates are
+    # task performance, not data quality, and stay in quality.csv.
+    if th["flag_no_response"]:
+        for blk in summary["blocks"]:
+            label = f"Block {blk['block']} ({blk['n']}-back)"
+            if blk["hits"] + blk["false_alarms"] == 0:
+                issues.append(f"{label}: no key presses")
+            elif blk["targets"] and blk["missed"] == blk["targets"]:
+                issues.append(f"{label}: missed all {blk['targets']} targets")
+    return issues
+
+def write_summary(folder_path, summary, issues):
+    """Write quality.csv next to eye_data.csv."""
+    path = os.path.join(folder_path, "quality.csv")
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        w.writerow(["Metric", "Value"])
+        for key in ("expected_hz", "samples", "duration_s", "valid_ratio", "effective_hz",
+                    "rate_ratio", "start_delay_s", "gaps", "max_gap_ms", "leading_nan_s"):
+            w.writerow([key, "" if summary[key] is None else summary[key]])
+        for blk in summary["blocks"]:
+            prefix = f"block_{blk['block']}"
+            for key in ("n", "targets", "hits", "missed", "false_alarms"):
+                w.writerow([f"{prefix}_{key}", blk[key]])
+        w.writerow(["status", "FLAGGED" if issues else "OK"])
+        for issue in issues:
+            w.writerow(["issue", issue])
+    return path
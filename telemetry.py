@@ -0,0 +1,163 @@
+# telemetry.py
+#
+# Live session telemetry for the operator. The recorder and the trial loop
+# push cheap updates into in-memory counters; a background thread turns them
+# into NDJSON datagrams and sends them over local UDP. Nothing here ever
+# blocks the experiment: events go into a bounded queue (oldest dropped when
+# full) and sends are non-blocking (a batch is dropped if the socket is busy
+# or nobody is listening).
+#
+# Run `python telemetry_viewer.py` in a second terminal to watch the stream.
+
+import json
+import socket
+import threading
+import time
+from collections import deque
+
+# ─────────────────────────────────────────────────────────────────────────────
+# CONFIG
+# ─────────────────────────────────────────────────────────────────────────────
+TELEMETRY_HOST     = "127.0.0.1"
+TELEMETRY_PORT     = 47800
+FLUSH_INTERVAL_S   = 0.25    # one status message + queued events per tick
+MAX_PENDING_EVENTS = 256     # older events are dropped beyond this
+MAX_DATAGRAM_BYTES = 1400    # stay under a typical MTU
+
+# ─────────────────────────────────────────────────────────────────────────────
+# STATE
+# ─────────────────────────────────────────────────────────────────────────────
+_lock    = threading.Lock()
+_sock    = None
+_thread  = None
+_running = threading.Event()
+_pending = deque(maxlen=MAX_PENDING_EVENTS)
+
+_context = {"pid": None, "trial": None, "block": None, "n": None, "letter": None}
+_last_rt = None
+_dropped = 0
+
+# Gaze counters for the current flush window
+_win_samples = 0
+_win_nan     = 0
+_buffer_fill = 0
+
+# ─────────────────────────────────────────────────────────────────────────────
+# PRODUCER API (called from the experiment / gaze callback)
+# ─────────────────────────────────────────────────────────────────────────────
+def set_context(**fields):
+    """Update the current trial/block/letter context, e.g. set_context(trial=2, letter='K')."""
+    with _lock:
+        _context.update(fields)
+
+def gaze_sample(valid, buffer_fill):
+    """Count one gaze sample. Called from the Tobii callback thread, so keep it tiny."""
+    global _win_samples, _win_nan, _buffer_fill
+    with _lock:
+        _win_samples += 1
+        if not valid:
+            _win_nan += 1
+        _buffer_fill = buffer_fill
+
+def response(rt):
+    """Record the latest reaction time (seconds) and queue a response event."""
+    global _last_rt
+    with _lock:
+        _last_rt = rt
+    event("response", rt=rt)
+
+def event(name, **fields):
+    """Queue a one-off event; it is sent with the next batch."""
+    global _dropped
+    if not _running.is_set():
+        return
+    msg = {"type": "event", "name": name, "t": round(time.time(), 4)}
+    msg.update(fields)
+    with _lock:
+        if len(_pending) == _pending.maxlen:
+            _dropped += 1
+        _pending.append(msg)
+
+# ─────────────────────────────────────────────────────────────────────────────
+# PUBLISHER
+# ─────────────────────────────────────────────────────────────────────────────
+def _snapshot(window_s):
+    global _win_samples, _win_nan
+    with _lock:
+        samples, nans = _win_samples, _win_nan
+        _win_samples = 0
+        _win_nan     = 0
+        events = list(_pending)
+        _pending.clear()
+        status = {
+            "type":      "status",
+            "t":         round(time.time(), 4),
+            **_context,
+            "rate_hz":   round(samples / window_s, 1) if window_s > 0 else 0.0,
+            "nan_ratio": round(nans / samples, 3) if samples else None,
+            "rt":        round(_last_rt, 4) if _last_rt is not None else None,
+            "buffer":    _buffer_fill,
+            "dropped":   _dropped,
+        }
+    return events + [status]
+
+def _batches(messages):
+    # Pack NDJSON lines into datagrams no larger than MAX_DATAGRAM_BYTES.
+    batch = b""
+    for msg in messages:
+        line = json.dumps(msg, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+        if batch and len(batch) + len(line) > MAX_DATAGRAM_BYTES:
+            yield batch
+            batch = b""
+        batch += line
+    if batch:
+        yield batch
+
+def _send(messages):
+    global _dropped
+    for datagram in _batches(messages):
+        try:
+            _sock.sendto(datagram, (TELEMETRY_HOST, TELEMETRY_PORT))
+        except OSError:
+            # Busy socket or no listener: drop and move on.
+            with _lock:
+                _dropped += 1
+
+def _run():
+    last = time.time()
+    while _running.is_set():
+        time.sleep(FLUSH_INTERVAL_S)
+        now = time.time()
+        _send(_snapshot(now - last))
+        last = now
+
+def start_telemetry(pid=None):
+    global _sock, _thread, _win_samples, _win_nan, _last_rt, _dropped
+    if _running.is_set():
+        return
+    try:
+        _sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        _sock.setblocking(False)
+    except OSError as e:
+        print(f"[WARN] Telemetry disabled: {e}")
+        _sock = None
+        return
+    with _lock:
+        _context.update(pid=pid, trial=None, block=None, n=None, letter=None)
+        _win_samples = _win_nan = _dropped = 0
+        _last_rt = None
+        _pending.clear()
+    _running.set()
+    _thread = threading.Thread(target=_run, name="telemetry", daemon=True)
+    _thread.start()
+    print(f"[DEBUG] Telemetry → udp://{TELEMETRY_HOST}:{TELEMETRY_PORT}")
+
+def stop_telemetry():
+    global _sock, _thread
+    if not _running.is_set():
+        return
+    _running.clear()
+    _thread.join()   # exits after at most one FLUSH_INTERVAL_S sleep + send
+    _thread = None
+    _sock.close()
+    _sock = None
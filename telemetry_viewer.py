@@ -0,0 +1,71 @@
+# telemetry_viewer.py
+#
+# Terminal viewer for the live telemetry stream published by telemetry.py.
+# Run in a second terminal while the experiment is going:
+#
+#     python telemetry_viewer.py [port]
+
+import json
+import os
+import socket
+import sys
+import time
+
+from telemetry import TELEMETRY_HOST, TELEMETRY_PORT
+
+STALE_AFTER_S = 2.0   # flag the stream if nothing arrives for this long
+
+def _fmt(value, spec=""):
+    return "-" if value is None else format(value, spec)
+
+def format_status(msg):
+    nan = msg.get("nan_ratio")
+    return (
+        f"pid {_fmt(msg.get('pid'))} | trial {_fmt(msg.get('trial'))}"
+        f" | block {_fmt(msg.get('block'))} ({_fmt(msg.get('n'))}-back)"
+        f" | letter {_fmt(msg.get('letter'))}"
+        f" | gaze {_fmt(msg.get('rate_hz'), '.1f')} Hz"
+        f" | nan {'-' if nan is None else f'{nan:.0%}'}"
+        f" | RT {_fmt(msg.get('rt'), '.3f')} s"
+        f" | buf {_fmt(msg.get('buffer'))}"
+        f" | dropped {_fmt(msg.get('dropped'))}"
+    )
+
+def format_event(msg):
+    extra = ", ".join(f"{k}={v}" for k, v in msg.items() if k not in ("type", "name", "t"))
+    stamp = time.strftime("%H:%M:%S", time.localtime(msg.get("t", time.time())))
+    return f"[{stamp}] {msg.get('name')}" + (f" ({extra})" if extra else "")
+
+def main(port=TELEMETRY_PORT):
+    if os.name == "nt":
+        os.system("")   # enable ANSI escape handling in legacy cmd.exe consoles
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind((TELEMETRY_HOST, port))
+    sock.settimeout(STALE_AFTER_S)
+    print(f"Listening on udp://{TELEMETRY_HOST}:{port} (Ctrl+C to quit)")
+    status_line = ""
+    while True:
+        try:
+            data, _ = sock.recvfrom(65535)
+        except socket.timeout:
+            if status_line:
+                sys.stdout.write("\r\033[K" + status_line + "  [no data]")
+                sys.stdout.flush()
+            continue
+        for line in data.splitlines():
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                continue
+            if msg.get("type") == "status":
+                status_line = format_status(msg)
+            else:
+                sys.stdout.write("\r\033[K" + format_event(msg) + "\n")
+        sys.stdout.write("\r\033[K" + status_line)
+        sys.stdout.flush()
+
+if __name__ == "__main__":
+    try:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else TELEMETRY_PORT)
+    except KeyboardInterrupt:
+        print()